@@ -2,5 +2,14 @@
 import asyncio
 from src.cli.main import main
 
+# libuv-backed event loop, used when installed (not available on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,16 +1,13 @@
 import argparse
 import asyncio
 import os
-import json
 from datetime import datetime
 
 from src.config import config
-from src.utils import setup_logger
-from src.scrapers.web_scraper import WebScraper, process_urls_from_json
-from src.scrapers.crawler import Crawler, run_crawler
-from src.processors.summarizer import Summarizer, summarize_directory
-from src.processors.translator import Translator, translate_directory
-from src.processors.voicerizor import process_directory as process_to_speech
+from src.utils import setup_logger, write_json, TokenBucket
+
+# The scrapers and processors are imported inside each command branch, so a
+# command only loads its own dependencies (Playwright, transformers, Kokoro)
 
 
 def setup_parser():
@@ -88,6 +85,25 @@ For detailed help on any command:
 """
     print(help_text)
 
+async def gather_or_cancel(*coroutines):
+    """
+    Runs coroutines concurrently and returns their results in order. When
+    one raises, the others are cancelled and its exception is re-raised.
+    """
+    tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    for task in done:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
 async def main():
     logger = setup_logger('main')
     parser = setup_parser()
@@ -99,6 +115,8 @@ async def main():
     
     try:
         if args.command == 'crawl':
+            from src.scrapers.crawler import run_crawler
+            
             # Override config with command line arguments
             crawler_config = config.CRAWLER_CONFIG.copy()
             crawler_config['SITE_PATH'] = args.site
@@ -111,22 +129,30 @@ async def main():
             logger.info(f"Crawling complete. Found {result['urls_count']} URLs.")
             
         elif args.command == 'scrape':
+            from src.scrapers.web_scraper import process_urls_from_json
+            
             output_dir = args.output_dir or config.get_output_dir()
             logger.info(f"Starting scraper with URLs from {args.urls_file}")
             result = await process_urls_from_json(args.urls_file, output_dir)
             logger.info(f"Scraping complete. Results saved to {result['output_dir']}")
             
         elif args.command == 'summarize':
+            from src.processors.summarizer import summarize_directory
+            
             logger.info(f"Starting summarization of files in {args.input_dir}")
             result = summarize_directory(args.input_dir, args.output_dir)
             logger.info(f"Summarization complete. Processed {result['processed']} files.")
             
         elif args.command == 'translate':
+            from src.processors.translator import translate_directory
+            
             logger.info(f"Starting translation of files in {args.input_dir}")
             result = translate_directory(args.input_dir, args.output_dir, args.pattern)
             logger.info(f"Translation complete. Processed {result['processed']} files.")
         
         elif args.command == 'speech':
+            from src.processors.voicerizor import process_directory as process_to_speech
+            
             output_dir = args.output_dir or f"audio_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             logger.info(f"Starting text-to-speech conversion of files in {args.input_dir}")
             mp3_files = process_to_speech(
@@ -138,6 +164,10 @@ async def main():
             logger.info(f"Text-to-speech conversion complete. Generated {len(mp3_files)} MP3 files in {output_dir}")
             
         elif args.command == 'pipeline':
+            from src.scrapers.crawler import run_crawler
+            from src.scrapers.web_scraper import process_urls
+            from src.processors.translator import translate_directory
+            
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             pipeline_dir = f"pipeline_{timestamp}"
             os.makedirs(pipeline_dir, exist_ok=True)
@@ -149,13 +179,25 @@ async def main():
             crawler_config['OUTPUT_DIR'] = os.path.join(pipeline_dir, "urls")
             crawler_config['MAX_PAGES'] = args.max_pages
             
-            logger.info("PIPELINE STEP 1: Crawling")
-            crawler_result = await run_crawler(crawler_config)
-            
-            # Step 2: Scrape
-            logger.info("PIPELINE STEP 2: Scraping")
+            # Steps 1 and 2: Crawl and scrape together; the scraper picks up
+            # each URL as soon as the crawler discovers it
+            logger.info("PIPELINE STEPS 1-2: Crawling and scraping")
             scrape_dir = os.path.join(pipeline_dir, "content")
-            scrape_result = await process_urls_from_json(crawler_result['output_file'], scrape_dir)
+            url_queue = asyncio.Queue()
+            
+            # Both hit the same site, so they share one request budget, the
+            # stricter of the crawler's and the scraper's pacing
+            rate_limiter = TokenBucket(
+                rate=min(
+                    2 / (crawler_config['DELAY_MIN'] + crawler_config['DELAY_MAX']),
+                    1 / config.SCRAPER_CONFIG['DELAY_BETWEEN_REQUESTS']
+                ),
+                capacity=config.SCRAPER_CONFIG.get('RATE_LIMIT_BURST', 1)
+            )
+            crawler_result, scrape_result = await gather_or_cancel(
+                run_crawler(crawler_config, url_queue, rate_limiter),
+                process_urls(url_queue, scrape_dir, rate_limiter)
+            )
             
             # Step 3: Translate directly from scraped content
             logger.info("PIPELINE STEP 3: Translating")
@@ -165,6 +207,8 @@ async def main():
             # Step 4 (Optional): Text-to-speech conversion
             speech_result = None
             if args.with_speech:
+                from src.processors.voicerizor import process_directory as process_to_speech
+                
                 logger.info("PIPELINE STEP 4: Text-to-speech conversion")
                 speech_dir = os.path.join(pipeline_dir, "audio")
                 mp3_files = process_to_speech(
@@ -196,8 +240,7 @@ async def main():
             if speech_result:
                 pipeline_results["speech"] = speech_result
                 
-            with open(os.path.join(pipeline_dir, "results.json"), "w") as f:
-                json.dump(pipeline_results, f, indent=2)
+            write_json(os.path.join(pipeline_dir, "results.json"), pipeline_results)
                 
             logger.info(f"Pipeline complete! All outputs saved in: {pipeline_dir}")
         
@@ -206,4 +249,11 @@ async def main():
         
         
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -2,25 +2,44 @@
 # Voicerizor - Convert markdown documents to MP3 files
 
 import os
-import glob
 import argparse
-import uuid
-import logging
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+import shutil
 import subprocess
 from kokoro import KPipeline
-import soundfile as sf
 import torch
 import numpy as np
-from pydub import AudioSegment
 import sys
 
 # Add parent directory to system path to import from other modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.logger import setup_logger
+from utils.fileio import iter_files
 
 logger = setup_logger('voicerizor')
 
+# Kokoro generates mono float32 audio at 24 kHz
+SAMPLE_RATE = 24000
+
+# ffmpeg executable, looked up once
+FFMPEG = shutil.which("ffmpeg")
+
+# Loaded Kokoro pipelines, one per language code
+_PIPELINES = {}
+
+
+def _get_pipeline(lang_code):
+    """Returns the Kokoro pipeline for lang_code, loading it on first use"""
+    pipeline = _PIPELINES.get(lang_code)
+    if pipeline is None:
+        logger.info(f"Initializing Kokoro pipeline with lang_code={lang_code}")
+        pipeline = _PIPELINES[lang_code] = KPipeline(lang_code=lang_code)
+    return pipeline
+
+
 class TextToSpeechProcessor:
     """Process markdown files to audio using Kokoro TTS engine"""
     
@@ -36,9 +55,8 @@ class TextToSpeechProcessor:
         self.lang_code = lang_code
         self.voice = voice
         
-        # Create pipeline
-        logger.info(f"Initializing Kokoro pipeline with lang_code={lang_code}")
-        self.pipeline = KPipeline(lang_code=lang_code)
+        # Reuse the pipeline already loaded for this language
+        self.pipeline = _get_pipeline(lang_code)
         
         # Set output directory
         if output_dir:
@@ -67,10 +85,6 @@ class TextToSpeechProcessor:
         # Get the UUID from the filename (removing .md extension)
         file_uuid = Path(md_file_path).stem
         
-        # Create a temporary directory for the WAV files
-        temp_dir = os.path.join(self.output_dir, f"temp_{file_uuid}")
-        os.makedirs(temp_dir, exist_ok=True)
-        
         # Read the markdown file
         with open(md_file_path, 'r', encoding='utf-8') as file:
             text = file.read()
@@ -79,46 +93,82 @@ class TextToSpeechProcessor:
         logger.info(f"Generating audio for {file_uuid}")
         generator = self.pipeline(text, voice=self.voice)
         
-        wav_files = []
-        for i, (gs, ps, audio) in enumerate(generator):
-            # Save each sentence as a separate WAV file
-            wav_file = os.path.join(temp_dir, f"{i:04d}.wav")
-            sf.write(wav_file, audio, 24000)
-            wav_files.append(wav_file)
-        
-        # Concatenate all WAV files into a single MP3 file
+        # Encode to MP3 while the audio is generated, feeding each
+        # sentence's samples to ffmpeg as soon as it is ready
         mp3_path = os.path.join(self.output_dir, f"{file_uuid}.mp3")
-        self._concatenate_and_convert(wav_files, mp3_path)
-        
-        # Clean up temporary files
-        for wav_file in wav_files:
-            os.remove(wav_file)
-        os.rmdir(temp_dir)
+        encoder = self._start_mp3_encoder(mp3_path)
+        segments = 0
+        try:
+            for gs, ps, audio in generator:
+                if audio is None:
+                    continue
+                encoder.stdin.write(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+                segments += 1
+        except Exception:
+            # Don't leave a truncated MP3 behind
+            encoder.kill()
+            encoder.wait()
+            if os.path.exists(mp3_path):
+                os.remove(mp3_path)
+            raise
+            
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {encoder.returncode} for {mp3_path}")
+        logger.info(f"Saved MP3 file with {segments} audio segments to {mp3_path}")
         
         return mp3_path
     
-    def _concatenate_and_convert(self, wav_files, output_mp3_path):
+    def _start_mp3_encoder(self, output_mp3_path, bitrate="192k"):
         """
-        Concatenate multiple WAV files into a single MP3 file
+        Start an ffmpeg process encoding raw PCM from its stdin to MP3
         
         Args:
-            wav_files (list): List of WAV file paths
             output_mp3_path (str): Output MP3 file path
+            bitrate (str): Constant bitrate, or None for VBR quality 2
+            
+        Returns:
+            subprocess.Popen: Encoder expecting mono float32 samples at SAMPLE_RATE
         """
-        logger.info(f"Concatenating {len(wav_files)} audio segments and converting to MP3")
-        
-        # Use pydub to concatenate the audio files
-        combined = AudioSegment.empty()
-        for wav_file in wav_files:
-            audio = AudioSegment.from_wav(wav_file)
-            combined += audio
-        
-        # Export as MP3
-        combined.export(output_mp3_path, format="mp3", bitrate="192k")
-        logger.info(f"Saved MP3 file to {output_mp3_path}")
+        if FFMPEG is None:
+            raise RuntimeError("ffmpeg is required for MP3 encoding but was not found on PATH")
+            
+        quality = ["-b:a", bitrate] if bitrate else ["-q:a", "2"]
+        return subprocess.Popen(
+            [
+                FFMPEG, "-y", "-loglevel", "error",
+                "-f", "f32le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+                "-acodec", "libmp3lame", *quality, output_mp3_path
+            ],
+            stdin=subprocess.PIPE
+        )
+
+
+# Processor owned by the current TTS worker process
+_worker_processor = None
+
+
+def _init_tts_worker(devices, workers, lang_code, voice, output_dir):
+    """
+    Pins a TTS worker to one GPU, or to its share of the CPU cores when
+    there is none, and loads its pipeline
+    """
+    global _worker_processor
+    device = devices.get()
+    if device is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(device)
+    else:
+        # Each worker would otherwise run one intra-op thread per core
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    _worker_processor = TextToSpeechProcessor(lang_code=lang_code, voice=voice, output_dir=output_dir)
 
 
-def process_directory(input_dir, output_dir=None, lang_code='f', voice='ff_siwis'):
+def _process_in_worker(md_file):
+    """Converts one markdown file with the worker's processor"""
+    return _worker_processor.process_markdown_file(md_file)
+
+
+def process_directory(input_dir, output_dir=None, lang_code='f', voice='ff_siwis', workers=None):
     """
     Process all markdown files in a directory
     
@@ -127,32 +177,66 @@ def process_directory(input_dir, output_dir=None, lang_code='f', voice='ff_siwis
         output_dir (str): Directory to save audio files
         lang_code (str): Language code
         voice (str): Voice model to use
+        workers (int): Number of TTS worker processes (default: TTS_WORKERS,
+            else one per GPU, else 2)
         
     Returns:
         list: Paths to the generated MP3 files
     """
-    # Initialize the processor
-    processor = TextToSpeechProcessor(lang_code=lang_code, voice=voice, output_dir=output_dir)
+    # Resolve the output directory once so every worker writes to it
+    if not output_dir:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = os.path.join(os.getcwd(), f"audio_output_{timestamp}")
     
     # Find all markdown files
-    md_files = glob.glob(os.path.join(input_dir, "*.md"))
+    md_files = list(iter_files(input_dir, "*.md"))
     logger.info(f"Found {len(md_files)} markdown files in {input_dir}")
+    if not md_files:
+        return []
+    
+    gpu_count = torch.cuda.device_count()
+    if workers is None:
+        workers = int(os.environ.get("TTS_WORKERS", gpu_count or 2))
+    workers = max(1, min(workers, len(md_files)))
     
-    # Process each file
     mp3_files = []
-    for md_file in md_files:
-        try:
-            mp3_path = processor.process_markdown_file(md_file)
-            mp3_files.append(mp3_path)
-        except Exception as e:
-            logger.error(f"Error processing {md_file}: {str(e)}")
+    if workers == 1:
+        # Process each file in this process
+        processor = TextToSpeechProcessor(lang_code=lang_code, voice=voice, output_dir=output_dir)
+        for md_file in md_files:
+            try:
+                mp3_path = processor.process_markdown_file(md_file)
+                mp3_files.append(mp3_path)
+            except Exception as e:
+                logger.error(f"Error processing {md_file}: {str(e)}")
+        return mp3_files
+        
+    # Spread the files over worker processes, each holding its own pipeline
+    # on its own GPU when there are any. Spawned workers start without CUDA
+    # state, so the device pinned in the initializer takes effect.
+    logger.info(f"Converting with {workers} TTS worker processes")
+    ctx = multiprocessing.get_context("spawn")
+    devices = ctx.Queue()
+    for i in range(workers):
+        devices.put(i % gpu_count if gpu_count else None)
+        
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_tts_worker,
+        initargs=(devices, workers, lang_code, voice, output_dir)
+    ) as pool:
+        futures = {pool.submit(_process_in_worker, md_file): md_file for md_file in md_files}
+        for future in as_completed(futures):
+            try:
+                mp3_files.append(future.result())
+            except Exception as e:
+                logger.error(f"Error processing {futures[future]}: {str(e)}")
     
     return mp3_files
 
 
 if __name__ == "__main__":
-    import datetime
-    
     parser = argparse.ArgumentParser(description="Convert markdown files to MP3 audio files")
     parser.add_argument(
         "--input", "-i", 
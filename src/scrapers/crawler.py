@@ -1,13 +1,14 @@
-from urllib.parse import urlparse, urljoin
 import asyncio
-import json
 import os
 import random
+import socket
 import time
+import aiohttp
+import lxml.html
 from playwright.async_api import async_playwright
 
 from src.config import config
-from src.utils import setup_logger
+from src.utils import setup_logger, TokenBucket, dumps_json, loads_json, read_json, write_json
 
 # User agent rotation list for stealth browsing
 USER_AGENTS = [
@@ -19,6 +20,170 @@ USER_AGENTS = [
     'Mozilla/5.0 (iPad; CPU OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1'
 ]
 
+# Browser-like headers sent with every request, by the browser contexts and
+# the plain HTTP session alike
+EXTRA_HTTP_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'fr,fr-FR;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache',
+    'Sec-Ch-Ua': '"Google Chrome";v="119", "Chromium";v="119", "Not?A_Brand";v="24"',
+    'Sec-Ch-Ua-Mobile': '?0',
+    'Sec-Ch-Ua-Platform': '"Windows"',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Injected into every page of a stealth context to hide automation markers
+STEALTH_INIT_SCRIPT = """
+// Hide Playwright/Puppeteer indicators
+Object.defineProperty(navigator, 'webdriver', { get: () => false });
+Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
+Object.defineProperty(navigator, 'languages', { get: () => ['fr-FR', 'fr', 'en-US', 'en'] });
+
+// WebGL modifications to avoid fingerprinting
+const getParameter = WebGLRenderingContext.prototype.getParameter;
+WebGLRenderingContext.prototype.getParameter = function(parameter) {
+  if (parameter === 37445) {
+    return 'Intel Inc.';
+  } else if (parameter === 37446) {
+    return 'Intel Iris Pro Graphics';
+  }
+  return getParameter.apply(this, arguments);
+};
+
+// Hide Playwright-specific variables
+delete window.playwright;
+"""
+
+# Links to files and media, never crawled as pages
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.png', '.gif', '.zip', '.mp3', '.mp4')
+
+# Query parameters kept when normalizing a URL
+IMPORTANT_PARAM_PREFIXES = ('id=', 'page=', 'category=', 'p=')
+
+# Subresources that never carry links, aborted before they are fetched
+BLOCKED_RESOURCE_TYPES = frozenset(['image', 'media', 'font', 'stylesheet'])
+
+# Ad and analytics hosts whose requests only slow down networkidle
+BLOCKED_DOMAINS = (
+    'doubleclick.net',
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'facebook.net',
+    'hotjar.com',
+)
+
+# Rendered pages with fewer links than this are scrolled to trigger lazy loading
+LAZY_LOAD_MIN_LINKS = 20
+
+# Cookie banners and popups closed on rendered pages, as one selector
+# list so a single locator finds the first match
+POPUP_SELECTOR = ', '.join([
+    'button[aria-label="Close"]',
+    '.cookie-banner button',
+    '#cookieConsent button',
+    '.consent-banner button',
+    '.popup-close',
+    '.modal-close',
+    '.close-button',
+    '.cookie-accept',
+    '.cookies-accept',
+    '.accept-cookies',
+    'button:has-text("Accepter")',
+    'button:has-text("J\'accepte")',
+    'button:has-text("Accepter les cookies")',
+    'a:has-text("Accepter")',
+    '[data-testid="cookie-policy-dialog-accept-button"]',
+    '[class*="cookie"] [class*="accept"]',
+    '[class*="cookie"] [class*="close"]',
+    '[id*="cookie"] [id*="accept"]',
+    '[id*="cookie"] [id*="close"]'
+])
+
+
+def normalize_internal_link(link, allowed_netlocs):
+    """
+    Returns link as scheme://netloc/path with the trailing slash, the
+    fragment and all but the important query parameters removed, or None
+    when it points off-site or at a file. Splits the string directly
+    instead of building a urlparse result for every link on a page
+    """
+    # Ignore files and images
+    if link.endswith(SKIPPED_EXTENSIONS):
+        return None
+        
+    link = link.partition('#')[0]
+    base, _, query = link.partition('?')
+    scheme, sep, rest = base.partition('://')
+    if not sep:
+        return None
+        
+    # Check if it's an internal link
+    netloc, slash, path = rest.partition('/')
+    if netloc not in allowed_netlocs:
+        return None
+        
+    normalized_url = f"{scheme.lower()}://{netloc}{slash}{path}"
+    if normalized_url.endswith('/'):
+        normalized_url = normalized_url[:-1]
+        
+    # Keep important parameters
+    if query:
+        important_params = [p for p in query.split('&') if p.startswith(IMPORTANT_PARAM_PREFIXES)]
+        if important_params:
+            normalized_url += '?' + '&'.join(important_params)
+            
+    return normalized_url
+
+
+async def _block_heavy_resources(route):
+    """Aborts requests for media and trackers that link extraction does not need"""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(domain in request.url for domain in BLOCKED_DOMAINS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class RandomFrontier:
+    """
+    Set of URLs still to visit with O(1) add, membership test and removal
+    of a random element; a list holds the URLs and a dict their positions
+    """
+    
+    def __init__(self, urls=()):
+        self._urls = []
+        self._index = {}
+        for url in urls:
+            self.add(url)
+            
+    def __len__(self):
+        return len(self._urls)
+        
+    def __contains__(self, url):
+        return url in self._index
+        
+    def add(self, url):
+        if url not in self._index:
+            self._index[url] = len(self._urls)
+            self._urls.append(url)
+            
+    def pop_random(self):
+        """Remove and return a random URL by swapping it with the last one"""
+        i = random.randrange(len(self._urls))
+        url = self._urls[i]
+        last = self._urls.pop()
+        if last != url:
+            self._urls[i] = last
+            self._index[last] = i
+        del self._index[url]
+        return url
+
 
 class Crawler:
     def __init__(self, site_config=None):
@@ -34,24 +199,116 @@ class Crawler:
         self.timeout = self.config['TIMEOUT']
         self.retries = self.config['RETRIES']
         self.stealth_mode = self.config['STEALTH_MODE']
+        # Site-wide pacing: one visit per average configured delay, so
+        # concurrent visits and fast pages do not add idle time of their own
+        self.rate_limiter = TokenBucket(
+            rate=2 / (self.delay_min + self.delay_max),
+            capacity=self.config.get('RATE_LIMIT_BURST', 1)
+        )
+        # Hosts whose links count as internal
+        self.allowed_netlocs = frozenset((self.site_path, f"www.{self.site_path}"))
+        # Pages visited at the same time in the shared browser context
+        self.max_parallel = int(self.config.get('MAX_PARALLEL_PAGES', 5))
+        # Pages visited before the browser context is replaced, which keeps
+        # Playwright's per-context memory from growing over long crawls
+        self.context_recycle_pages = int(self.config.get('CONTEXT_RECYCLE_PAGES', 50))
+        # Optional asyncio.Queue that receives every newly discovered URL,
+        # closed with None once crawling finishes
+        self.url_queue = None
+        # Newly discovered URLs are appended to a JSONL log next to the
+        # output file, which is only rewritten in full every few hundred pages
+        self.save_every = int(self.config.get('SAVE_EVERY_PAGES', 500))
+        self.delta_path = os.path.join(self.output_dir, os.path.splitext(self.output_file)[0] + '.jsonl')
+        self._delta_file = None
+        # Pages crawled successfully are logged too, so a resumed crawl does
+        # not visit them again
+        self.visited_path = os.path.join(self.output_dir, os.path.splitext(self.output_file)[0] + '_visited.jsonl')
+        self._visited_file = None
+        # Minimum number of links a plain HTTP fetch must find for a page to
+        # skip the browser
+        self.static_min_links = int(self.config.get('STATIC_MIN_LINKS', 10))
+        self._http = None
+        # Resolver rules the running browser was launched with
+        self._host_rules = ''
         
     async def load_existing_urls(self):
-        """Load URLs already discovered from JSON file"""
+        """Load URLs already discovered from the JSON file and its JSONL log"""
         try:
+            urls = set()
             filepath = os.path.join(self.output_dir, self.output_file)
             if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    return set(data.get("urls", []))
-            return set()
+                data = read_json(filepath)
+                urls.update(data.get("urls", []))
+            if os.path.exists(self.delta_path):
+                with open(self.delta_path, 'rb') as f:
+                    for line in f:
+                        try:
+                            urls.add(loads_json(line))
+                        except ValueError:
+                            continue  # Line cut short by an interrupted run
+            return urls
         except Exception as e:
             self.logger.error(f"Error loading existing URLs: {e}")
             return set()
 
+    def load_visited_urls(self):
+        """Load the URLs crawled successfully by earlier runs from the visited log"""
+        visited = set()
+        if not os.path.exists(self.visited_path):
+            return visited
+            
+        with open(self.visited_path, 'rb') as f:
+            for line in f:
+                try:
+                    visited.add(loads_json(line))
+                except ValueError:
+                    continue  # Line cut short by an interrupted run
+        return visited
+
+    def _open_log(self, path):
+        """Opens a JSONL log for appending, terminating any cut-short last line"""
+        log_file = open(path, 'a+b')
+        if log_file.tell() > 0:
+            log_file.seek(-1, os.SEEK_END)
+            if log_file.read(1) != b'\n':
+                log_file.write(b'\n')
+        return log_file
+
+    async def _resolve_site_hosts(self):
+        """
+        Returns "MAP host ip" resolver rules for the crawled site's hosts, or
+        an empty string when none of them resolves. Only IPv4 addresses are
+        pinned, since a pinned IPv6 address is not retried over IPv4 on
+        networks without IPv6 connectivity
+        """
+        loop = asyncio.get_running_loop()
+        rules = []
+        for host in sorted(self.allowed_netlocs):
+            try:
+                infos = await loop.getaddrinfo(host, 443, family=socket.AF_INET, type=socket.SOCK_STREAM)
+            except OSError as e:
+                self.logger.warning(f"Could not resolve {host}: {e}")
+                continue
+            address = infos[0][4][0]
+            self.logger.info(f"Pinning {host} to {address}")
+            rules.append(f"MAP {host} {address}")
+        return ','.join(rules)
+
     async def configure_browser(self):
         """Configure the browser with advanced settings to avoid detection"""
         playwright = await async_playwright().start()
         
+        # Resolve the site once and pin it in the browser's resolver, so
+        # navigations do not each wait on a DNS lookup
+        self._host_rules = await self._resolve_site_hosts()
+        browser = await self.launch_browser(playwright, self._host_rules)
+        
+        context = await self.new_context(browser)
+        
+        return playwright, browser, context
+
+    async def launch_browser(self, playwright, host_rules):
+        """Launch Chromium with the stealth arguments, pinning the site to host_rules"""
         # Browser launch options
         browser_args = [
             '--disable-blink-features=AutomationControlled',
@@ -64,15 +321,21 @@ class Crawler:
             '--window-size=1920,1080',
         ]
         
+        if host_rules:
+            browser_args.append(f"--host-resolver-rules={host_rules}")
+        
         # Launch browser (using Chromium as it's more stable for scraping)
-        browser = await playwright.chromium.launch(
+        return await playwright.chromium.launch(
             headless=self.stealth_mode,  # Visible mode can help avoid detection
             args=browser_args,
             ignore_default_args=['--enable-automation']  # Important to avoid detection
         )
-        
+
+    async def new_context(self, browser, storage_state=None):
+        """Create a browser context with stealth settings and a random user agent"""
         # Create browser context with specific settings
         context = await browser.new_context(
+            storage_state=storage_state,  # Cookies carried over from a recycled context
             viewport={'width': 1920, 'height': 1080},
             user_agent=random.choice(USER_AGENTS),
             has_touch=True,  # Simulate a touch device
@@ -81,69 +344,31 @@ class Crawler:
             timezone_id='Europe/Paris',  # French timezone
             bypass_csp=True,  # Bypass content security policy
             accept_downloads=True,
-            extra_http_headers={
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'fr,fr-FR;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache',
-                'Sec-Ch-Ua': '"Google Chrome";v="119", "Chromium";v="119", "Not?A_Brand";v="24"',
-                'Sec-Ch-Ua-Mobile': '?0',
-                'Sec-Ch-Ua-Platform': '"Windows"',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'same-origin',
-                'Sec-Fetch-User': '?1',
-                'Upgrade-Insecure-Requests': '1',
-            }
+            extra_http_headers=EXTRA_HTTP_HEADERS
         )
         
         # Add scripts to avoid detection
         if self.stealth_mode:
-            await context.add_init_script("""
-            // Hide Playwright/Puppeteer indicators
-            Object.defineProperty(navigator, 'webdriver', { get: () => false });
-            Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
-            Object.defineProperty(navigator, 'languages', { get: () => ['fr-FR', 'fr', 'en-US', 'en'] });
-            
-            // WebGL modifications to avoid fingerprinting
-            const getParameter = WebGLRenderingContext.prototype.getParameter;
-            WebGLRenderingContext.prototype.getParameter = function(parameter) {
-              if (parameter === 37445) {
-                return 'Intel Inc.';
-              } else if (parameter === 37446) {
-                return 'Intel Iris Pro Graphics';
-              }
-              return getParameter.apply(this, arguments);
-            };
-            
-            // Hide Playwright-specific variables
-            delete window.playwright;
-            """)
+            await context.add_init_script(STEALTH_INIT_SCRIPT)
         
-        return playwright, browser, context
+        # Skip images, fonts and trackers; the route goes away with the
+        # context when it is recycled
+        await context.route("**/*", _block_heavy_resources)
+        
+        return context
 
     async def extract_links_with_multiple_methods(self, page, url):
-        """Extract links using different methods to maximize success chance"""
+        """Extract links from hrefs, onclick handlers and data attributes in one pass"""
         all_links = set()
         
-        # Method 1: Direct extraction via <a> selectors
-        try:
-            links = await page.query_selector_all('a[href]')
-            for link in links:
-                href = await link.get_attribute('href')
-                if href and not href.startswith(('javascript:', 'mailto:', 'tel:', '#')):
-                    full_url = urljoin(url, href)
-                    all_links.add(full_url)
-        except Exception as e:
-            self.logger.error(f"Error extracting links via selectors: {e}")
-        
-        # Method 2: Use JavaScript to extract all possible links
+        # One evaluate call collects every link; the browser has already
+        # resolved relative hrefs against the page URL
         try:
             js_links = await page.evaluate("""
             () => {
                 const extractedLinks = new Set();
                 
-                // Get all elements with href attribute
+                // Get all anchors and other elements with an href attribute
                 document.querySelectorAll('[href]').forEach(el => {
                     if (el.href && !el.href.startsWith('javascript:') && 
                         !el.href.startsWith('mailto:') && !el.href.startsWith('tel:')) {
@@ -151,28 +376,24 @@ class Crawler:
                     }
                 });
                 
-                // Find links in onclick, data-attributes, etc.
-                document.querySelectorAll('*').forEach(el => {
+                // Find links in onclick handlers and data attributes, only on
+                // the elements that carry them
+                const locationRe = /window\.location\.href\s*=\s*['"]([^'"]+)['"]/g;
+                document.querySelectorAll('[onclick], [data-href], [data-url], [data-link]').forEach(el => {
                     // Search in onclick
-                    if (el.onclick) {
-                        const onclickStr = el.onclick.toString();
-                        const matches = onclickStr.match(/window\.location\.href\s*=\s*['"]([^'"]+)['"]/g);
-                        if (matches) {
-                            matches.forEach(match => {
-                                const url = match.replace(/window\.location\.href\s*=\s*['"]/g, '').replace(/['"]$/, '');
-                                if (url) extractedLinks.add(url);
-                            });
+                    const onclickStr = el.getAttribute('onclick');
+                    if (onclickStr) {
+                        for (const match of onclickStr.matchAll(locationRe)) {
+                            extractedLinks.add(match[1]);
                         }
                     }
                     
                     // Search in data-attributes
-                    if (el.dataset) {
-                        Object.values(el.dataset).forEach(value => {
-                            if (value && value.startsWith('http')) {
-                                extractedLinks.add(value);
-                            }
-                        });
-                    }
+                    Object.values(el.dataset).forEach(value => {
+                        if (value && value.startsWith('http')) {
+                            extractedLinks.add(value);
+                        }
+                    });
                 });
                 
                 return Array.from(extractedLinks);
@@ -184,12 +405,72 @@ class Crawler:
         
         return all_links
 
-    async def visit_page(self, context, url, visited_links, all_links, failed_links):
-        """Visit a page and extract all internal links"""
-        page = None
+    async def fetch_static_links(self, url):
+        """
+        Fetches a page with a plain HTTP GET and returns the absolute hrefs of
+        the anchors in its server-rendered markup, or None if the fetch fails
+        """
+        try:
+            async with self._http.get(url) as response:
+                if response.status != 200 or 'html' not in response.content_type:
+                    return None
+                body = await response.read()
+                base_url = str(response.url)
+        except Exception as e:
+            self.logger.warning(f"Plain fetch of {url} failed: {e}")
+            return None
+            
+        try:
+            document = lxml.html.fromstring(body, base_url=base_url)
+        except Exception:
+            return None
+        document.make_links_absolute(base_url, handle_failures='discard')
+        # Anchors only, like the a[href] the rendered path reads; <link> and
+        # <base> hrefs in the head would inflate the STATIC_MIN_LINKS count
+        return set(document.xpath('//a/@href'))
+
+    def collect_internal_links(self, raw_links, all_links):
+        """Normalize the internal links among raw_links and record the new ones in all_links"""
+        # Filter to keep only internal links
+        internal_links = set()
+        for link in raw_links:
+            normalized_url = normalize_internal_link(link, self.allowed_netlocs)
+            if normalized_url:
+                internal_links.add(normalized_url)
+        
+        # Add discovered links
+        new_links_found = 0
+        for link in internal_links:
+            if link not in all_links:
+                all_links.add(link)
+                new_links_found += 1
+                self._delta_file.write(dumps_json(link) + b'\n')
+                if self.url_queue is not None:
+                    self.url_queue.put_nowait(link)
+        
+        self.logger.info(f"  → {new_links_found} new URLs discovered on this page")
+        
+        return internal_links
+
+    async def visit_page(self, context, pages, slot, url, visited_links, all_links, failed_links):
+        """
+        Visit a page and extract all internal links, rendering it in the
+        long-lived browser page pages[slot]
+        """
+        # Server-rendered pages are read over plain HTTP; the browser is only
+        # used when the markup alone yields too few links
+        raw_links = await self.fetch_static_links(url)
+        if raw_links is not None and len(raw_links) >= self.static_min_links:
+            return self.collect_internal_links(raw_links, all_links), True
+            
+        # The browser navigation is a second request to the site
+        await self.rate_limiter.acquire()
+        
+        page = pages[slot]
         try:
-            # Create a new page for each visit (to avoid state problems)
-            page = await context.new_page()
+            # Reuse this slot's page, opening one on first use or after a crash
+            if page is None or page.is_closed():
+                page = pages[slot] = await context.new_page()
             
             # Actions to act like a real user
             await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout)
@@ -200,11 +481,18 @@ class Crawler:
             # Simulate random mouse movements
             await page.mouse.move(random.randint(100, 500), random.randint(100, 500))
             
-            # Wait for the page to be truly loaded
-            await page.wait_for_load_state("networkidle", timeout=self.timeout)
-            
-            # Scroll the page like a real user
-            await page.evaluate("""
+            # Links are in the DOM once the first anchor shows up; waiting for
+            # networkidle can take many seconds on pages that keep polling
+            try:
+                await page.wait_for_selector('a[href]', timeout=3000)
+            except Exception:
+                pass
+                
+            # Scroll the page like a real user, only when so few links are
+            # present that the page probably loads more on scroll
+            anchor_count = await page.evaluate("() => document.querySelectorAll('a[href]').length")
+            if anchor_count < LAZY_LOAD_MIN_LINKS:
+                await page.evaluate("""
             async () => {
                 const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
                 
@@ -227,96 +515,57 @@ class Crawler:
             }
             """)
             
-            # Try to close popups and cookies
+            # Close the first cookie banner or popup found, if any
             try:
-                # List of common selectors for cookie banners and popups
-                popup_selectors = [
-                    'button[aria-label="Close"]',
-                    '.cookie-banner button', 
-                    '#cookieConsent button',
-                    '.consent-banner button',
-                    '.popup-close',
-                    '.modal-close',
-                    '.close-button',
-                    '.cookie-accept',
-                    '.cookies-accept',
-                    '.accept-cookies',
-                    'button:has-text("Accepter")',
-                    'button:has-text("J\'accepte")',
-                    'button:has-text("Accepter les cookies")',
-                    'a:has-text("Accepter")',
-                    '[data-testid="cookie-policy-dialog-accept-button"]',
-                    '[class*="cookie"] [class*="accept"]',
-                    '[class*="cookie"] [class*="close"]',
-                    '[id*="cookie"] [id*="accept"]',
-                    '[id*="cookie"] [id*="close"]'
-                ]
+                await page.locator(POPUP_SELECTOR).first.click(timeout=1500)
+                await asyncio.sleep(0.5)
+            except Exception:
+                pass  # No popup appeared before the timeout
                 
-                for selector in popup_selectors:
-                    try:
-                        if await page.query_selector(selector):
-                            await page.click(selector, timeout=5000)
-                            await asyncio.sleep(0.5)
-                    except Exception:
-                        continue  # Ignore if the selector doesn't exist or isn't clickable
-            except Exception as e:
-                self.logger.error(f"Error closing popups: {e}")
-            
             # Wait a bit longer to make sure everything is loaded
             await asyncio.sleep(1)
             
             # Extract all links
             raw_links = await self.extract_links_with_multiple_methods(page, url)
             
-            # Filter to keep only internal links
-            internal_links = set()
-            for link in raw_links:
-                try:
-                    # URL cleaning and normalization
-                    parsed = urlparse(link)
-                    
-                    # Check if it's an internal link
-                    if parsed.netloc == self.site_path or parsed.netloc == f"www.{self.site_path}":
-                        # Ignore files and images
-                        if not any(link.endswith(ext) for ext in ['.pdf', '.jpg', '.png', '.gif', '.zip', '.mp3', '.mp4']):
-                            # Normalize the URL
-                            normalized_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-                            if parsed.path.endswith('/'):
-                                normalized_url = normalized_url[:-1]
-                                
-                            # Keep important parameters
-                            if parsed.query:
-                                params = parsed.query.split('&')
-                                important_params = [p for p in params if p.startswith(('id=', 'page=', 'category=', 'p='))]
-                                if important_params:
-                                    normalized_url += '?' + '&'.join(important_params)
-                                    
-                            internal_links.add(normalized_url)
-                except Exception:
-                    continue
-            
-            # Add discovered links
-            new_links_found = 0
-            for link in internal_links:
-                if link not in all_links:
-                    all_links.add(link)
-                    new_links_found += 1
+            internal_links = self.collect_internal_links(raw_links, all_links)
             
-            self.logger.info(f"  → {new_links_found} new URLs discovered on this page")
-            
-            # Close the page
-            await page.close()
+            # Unload the document so the page holds nothing until its next URL
+            await page.goto('about:blank')
             return internal_links, True
         
         except Exception as e:
             self.logger.error(f"Error visiting {url}: {e}")
             if page:
                 try:
-                    await page.close()
+                    await page.goto('about:blank')
                 except:
-                    pass
+                    # Close a page that cannot be reset; its slot opens a new one
+                    try:
+                        await page.close()
+                    except:
+                        pass
             return set(), False
 
+    async def visit_with_retries(self, context, pages, slot, url, visited_links, all_links, failed_links):
+        """Visit a page up to self.retries times; returns its internal links, or None if every attempt failed"""
+        for attempt in range(self.retries):
+            if attempt > 0:
+                self.logger.info(f"  Attempt {attempt+1}/{self.retries} for {url}")
+                
+            # Wait for the site's rate limit, then visit the page and extract links
+            await self.rate_limiter.acquire()
+            internal_links, visit_success = await self.visit_page(
+                context, pages, slot, url, visited_links, all_links, failed_links
+            )
+            if visit_success:
+                return internal_links
+                
+            # In case of failure, wait a bit longer before retrying
+            await asyncio.sleep(random.uniform(5, 10))
+            
+        return None
+
     def save_urls_to_json(self, urls):
         """Save the URL list to a JSON file"""
         try:
@@ -328,14 +577,18 @@ class Crawler:
             
             # Prepare the data
             data = {
-                "urls": sorted(list(urls)),
+                "urls": sorted(urls),
                 "count": len(urls),
                 "last_updated": time.strftime("%Y-%m-%d %H:%M:%S")
             }
             
             # Write to file
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            write_json(filepath, data)
+            
+            # Every logged URL is now in the JSON file
+            if self._delta_file:
+                self._delta_file.seek(0)
+                self._delta_file.truncate()
                 
             self.logger.info(f"URLs saved to {filepath}")
             return filepath
@@ -351,17 +604,20 @@ class Crawler:
         self.logger.info(f"Loaded {len(existing_urls)} already discovered URLs.")
         
         all_links = existing_urls.copy()  # Known URLs
-        visited_links = set()  # URLs visited in this session
+        if self.url_queue is not None:
+            for link in existing_urls:
+                self.url_queue.put_nowait(link)
+        visited_links = self.load_visited_urls()  # URLs visited by this and earlier runs
         failed_links = set()  # Failed URLs
         
         # Determine URLs to visit
         if existing_urls:
             # Start with existing unvisited URLs
-            links_to_visit = existing_urls.copy()
-            self.logger.info(f"Resuming crawling with {len(links_to_visit)} URLs to explore.")
+            links_to_visit = RandomFrontier(url for url in existing_urls if url not in visited_links)
+            self.logger.info(f"Resuming crawling with {len(links_to_visit)} URLs to explore, {len(visited_links)} already visited.")
         else:
             # New crawling, start with the starting URL
-            links_to_visit = {self.start_url}
+            links_to_visit = RandomFrontier([self.start_url])
             self.logger.info(f"Starting new crawling from {self.start_url}")
         
         # Configure the browser with advanced settings
@@ -370,65 +626,106 @@ class Crawler:
         try:
             # Page visit counter
             pages_visited = 0
+            last_saved = 0
+            pages_since_recycle = 0
+            
+            # One long-lived browser page per concurrent visit, opened on demand
+            pages = [None] * self.max_parallel
+            
+            # Session for the plain HTTP fetches, sending browser-like headers.
+            # One socket per concurrent visit is kept alive to the site.
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self.max_parallel,
+                    ttl_dns_cache=600,
+                    keepalive_timeout=60
+                ),
+                headers={**EXTRA_HTTP_HEADERS, 'User-Agent': random.choice(USER_AGENTS)},
+                timeout=aiohttp.ClientTimeout(total=self.timeout / 1000)
+            )
             
+            # Open the discovered-URL and visited-URL logs
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._delta_file = self._open_log(self.delta_path)
+            self._visited_file = self._open_log(self.visited_path)
+                    
             # While there are links to visit and we haven't reached the limit
             while links_to_visit and pages_visited < self.max_pages:
-                # Take a random link (more human-like behavior than a FIFO queue)
-                current_url = random.choice(list(links_to_visit))
-                links_to_visit.remove(current_url)
-                
-                # Check if already visited
-                if current_url in visited_links:
-                    continue
-                
-                # Mark as visited
-                visited_links.add(current_url)
-                pages_visited += 1
-                
-                self.logger.info(f"Visiting page {pages_visited}/{self.max_pages}: {current_url}")
-                
-                # Make multiple attempts if needed
-                success = False
-                for attempt in range(self.retries):
-                    if attempt > 0:
-                        self.logger.info(f"  Attempt {attempt+1}/{self.retries}")
+                # Pick the next batch of pages to visit concurrently
+                batch = []
+                while links_to_visit and pages_visited < self.max_pages and len(batch) < self.max_parallel:
+                    # Take a random link (more human-like behavior than a FIFO queue)
+                    current_url = links_to_visit.pop_random()
                     
-                    # Visit the page and extract links
-                    internal_links, visit_success = await self.visit_page(
-                        context, current_url, visited_links, all_links, failed_links
-                    )
-                    
-                    if visit_success:
-                        success = True
+                    # Check if already visited
+                    if current_url in visited_links:
+                        continue
                         
-                        # Add new links to visit
-                        for link in internal_links:
-                            if link not in visited_links and link not in links_to_visit and link not in failed_links:
-                                links_to_visit.add(link)
+                    # Mark as visited before dispatch so no page is scheduled twice
+                    visited_links.add(current_url)
+                    pages_visited += 1
+                    batch.append(current_url)
+                    
+                    self.logger.info(f"Visiting page {pages_visited}/{self.max_pages}: {current_url}")
+                    
+                results = await asyncio.gather(
+                    *(
+                        self.visit_with_retries(context, pages, slot, url, visited_links, all_links, failed_links)
+                        for slot, url in enumerate(batch)
+                    ),
+                    return_exceptions=True
+                )
+                
+                for current_url, internal_links in zip(batch, results):
+                    if isinstance(internal_links, Exception) or internal_links is None:
+                        failed_links.add(current_url)
+                        self.logger.error(f"  All attempts failed for {current_url}")
+                        continue
                         
-                        # Save periodically
-                        if pages_visited % 5 == 0:
-                            self.save_urls_to_json(all_links)
+                    self._visited_file.write(dumps_json(current_url) + b'\n')
+                    
+                    # Add new links to visit
+                    for link in internal_links:
+                        if link not in visited_links and link not in links_to_visit and link not in failed_links:
+                            links_to_visit.add(link)
                             
-                        break  # Exit the attempt loop
+                # Save periodically; in between, new URLs only go to the log
+                self._delta_file.flush()
+                self._visited_file.flush()
+                if pages_visited - last_saved >= self.save_every:
+                    self.save_urls_to_json(all_links)
+                    last_saved = pages_visited
                     
-                    # In case of failure, wait a bit longer before retrying
-                    await asyncio.sleep(random.uniform(5, 10))
-                
-                if not success:
-                    failed_links.add(current_url)
-                    self.logger.error(f"  All attempts failed for {current_url}")
-                
-                # Wait between each page (variable delay to appear human)
-                await asyncio.sleep(random.uniform(self.delay_min, self.delay_max))
+                # Replace the context and its pages between batches, while no
+                # visit is running, keeping its cookies so consent banners
+                # stay dismissed
+                pages_since_recycle += len(batch)
+                if pages_since_recycle >= self.context_recycle_pages:
+                    storage_state = await context.storage_state()
+                    await context.close()
+                    pages = [None] * self.max_parallel
+                    
+                    # Re-resolve the site; resolver rules only apply at
+                    # launch, so changed addresses relaunch the browser
+                    host_rules = await self._resolve_site_hosts()
+                    if host_rules != self._host_rules:
+                        self.logger.info("Site addresses changed, relaunching the browser")
+                        await browser.close()
+                        browser = await self.launch_browser(playwright, host_rules)
+                        self._host_rules = host_rules
+                    context = await self.new_context(browser, storage_state)
+                    pages_since_recycle = 0
         
         except Exception as e:
             self.logger.error(f"Error in the main crawling loop: {e}")
         
         finally:
-            # Close the browser
+            # Close the browser and the HTTP session
             await browser.close()
             await playwright.stop()
+            if self._http:
+                await self._http.close()
+                self._http = None
             
             # Display statistics
             self.logger.info(f"\nCrawling finished.")
@@ -438,6 +735,10 @@ class Crawler:
             
             # Save final results
             output_file = self.save_urls_to_json(all_links)
+            for log_file in (self._delta_file, self._visited_file):
+                if log_file:
+                    log_file.close()
+            self._delta_file = self._visited_file = None
             
             return {
                 "urls_count": len(all_links),
@@ -447,7 +748,17 @@ class Crawler:
             }
 
 
-async def run_crawler(config_override=None):
-    """Helper function to create and run a crawler instance"""
+async def run_crawler(config_override=None, url_queue=None, rate_limiter=None):
+    """
+    Helper function to create and run a crawler instance, optionally
+    pacing it with a TokenBucket shared with the scraper
+    """
     crawler = Crawler(config_override)
-    return await crawler.crawl()
\ No newline at end of file
+    crawler.url_queue = url_queue
+    if rate_limiter is not None:
+        crawler.rate_limiter = rate_limiter
+    try:
+        return await crawler.crawl()
+    finally:
+        if url_queue is not None:
+            url_queue.put_nowait(None)
\ No newline at end of file
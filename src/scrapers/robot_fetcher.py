@@ -1,32 +1,40 @@
+import aiohttp
+import asyncio
 import requests
 import os
 from urllib.parse import urlparse
 import time
-import json
 
-from src.utils import setup_logger
+from src.utils import setup_logger, write_json
 
 
 class RobotFetcher:
-    def __init__(self, output_dir="robot_job/output_robot"):
+    def __init__(self, output_dir="robot_job/output_robot", concurrency=10, max_retries=3):
         self.logger = setup_logger('robot_fetcher')
         self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        
+        # Reuse TCP/TLS connections across synchronous fetches
+        self.session = requests.Session()
         
         # Create output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
         
+    def _robots_url(self, url):
+        """Builds the robots.txt URL for the domain of a given URL"""
+        parsed_url = urlparse(url)
+        return f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+
     def get_robots_txt(self, url):
         """Fetches robots.txt from a given domain"""
         try:
-            # Parse the URL to get the domain
-            parsed_url = urlparse(url)
-            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            robots_url = f"{base_url}/robots.txt"
+            robots_url = self._robots_url(url)
             
             self.logger.info(f"Fetching robots.txt from {robots_url}")
             
             # Make the request with a timeout
-            response = requests.get(robots_url, timeout=10)
+            response = self.session.get(robots_url, timeout=10)
             
             # Check if successful
             if response.status_code == 200:
@@ -39,29 +47,37 @@ class RobotFetcher:
             self.logger.error(f"Error fetching robots.txt from {url}: {str(e)}")
             return None
             
+    def close(self):
+        """Closes the pooled HTTP connections"""
+        self.session.close()
+        
+    def _save_robots_txt(self, url, robots_content):
+        """Saves robots.txt content to a timestamped file named after the domain"""
+        # Extract domain for the filename
+        domain = urlparse(url).netloc
+        
+        # Clean up domain for filename
+        domain = domain.replace(".", "_")
+        
+        # Create filename with timestamp
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        filename = f"{domain}_{timestamp}_robots.txt"
+        
+        # Save to file
+        filepath = os.path.join(self.output_dir, filename)
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(robots_content)
+            
+        self.logger.info(f"Saved robots.txt to {filepath}")
+        return filepath
+            
     def fetch_and_save(self, url):
         """Fetches robots.txt and saves it to a file"""
         try:
             robots_content = self.get_robots_txt(url)
             
             if robots_content:
-                # Extract domain for the filename
-                domain = urlparse(url).netloc
-                
-                # Clean up domain for filename
-                domain = domain.replace(".", "_")
-                
-                # Create filename with timestamp
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                filename = f"{domain}_{timestamp}_robots.txt"
-                
-                # Save to file
-                filepath = os.path.join(self.output_dir, filename)
-                with open(filepath, "w", encoding="utf-8") as f:
-                    f.write(robots_content)
-                    
-                self.logger.info(f"Saved robots.txt to {filepath}")
-                return filepath
+                return self._save_robots_txt(url, robots_content)
             else:
                 self.logger.warning(f"No robots.txt content to save for {url}")
                 return None
@@ -70,47 +86,101 @@ class RobotFetcher:
             self.logger.error(f"Error saving robots.txt for {url}: {str(e)}")
             return None
             
-    def fetch_multiple(self, urls):
-        """Fetches robots.txt for multiple URLs"""
+    async def _fetch_one(self, semaphore, session, url):
+        """Fetches and saves robots.txt for one URL, retrying when rate limited"""
+        robots_url = self._robots_url(url)
+        robots_content = None
+        
+        async with semaphore:
+            for attempt in range(self.max_retries):
+                self.logger.info(f"Fetching robots.txt from {robots_url}")
+                async with session.get(robots_url) as response:
+                    if response.status == 429 and attempt < self.max_retries - 1:
+                        # Honour Retry-After when the server sends one
+                        retry_after = response.headers.get("Retry-After", "")
+                        delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+                        self.logger.warning(f"Rate limited on {robots_url}, retrying in {delay}s")
+                        await asyncio.sleep(delay)
+                        continue
+                        
+                    if response.status != 200:
+                        self.logger.warning(f"Failed to fetch robots.txt: Status code {response.status}")
+                        return None
+                        
+                    robots_content = await response.text()
+                    break
+                    
+        if not robots_content:
+            self.logger.warning(f"No robots.txt content to save for {url}")
+            return None
+            
+        return self._save_robots_txt(url, robots_content)
+        
+    async def fetch_multiple_async(self, urls):
+        """Fetches robots.txt for multiple URLs concurrently"""
         results = {
             "successful": [],
             "failed": []
         }
         
+        # One robots.txt per domain, so skip URLs whose domain is already queued
+        by_robots_url = {}
         for url in urls:
-            try:
-                result = self.fetch_and_save(url)
-                if result:
-                    results["successful"].append({
-                        "url": url,
-                        "file": result
-                    })
-                else:
-                    results["failed"].append({
-                        "url": url,
-                        "reason": "Failed to fetch or save"
-                    })
-            except Exception as e:
+            by_robots_url.setdefault(self._robots_url(url), url)
+        unique_urls = list(by_robots_url.values())
+        
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=10)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            outcomes = await asyncio.gather(
+                *(self._fetch_one(semaphore, session, url) for url in unique_urls),
+                return_exceptions=True
+            )
+            
+        for url, outcome in zip(unique_urls, outcomes):
+            if isinstance(outcome, Exception):
+                self.logger.error(f"Error fetching robots.txt from {url}: {str(outcome)}")
                 results["failed"].append({
                     "url": url,
-                    "reason": str(e)
+                    "reason": str(outcome)
+                })
+            elif outcome:
+                results["successful"].append({
+                    "url": url,
+                    "file": outcome
+                })
+            else:
+                results["failed"].append({
+                    "url": url,
+                    "reason": "Failed to fetch or save"
                 })
                 
         # Save summary
         summary_path = os.path.join(self.output_dir, f"summary_{time.strftime('%Y%m%d_%H%M%S')}.json")
-        with open(summary_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2)
+        write_json(summary_path, results)
             
-        self.logger.info(f"Processed {len(urls)} URLs, {len(results['successful'])} successful, {len(results['failed'])} failed")
+        self.logger.info(f"Processed {len(unique_urls)} URLs, {len(results['successful'])} successful, {len(results['failed'])} failed")
         return results
+        
+    def fetch_multiple(self, urls):
+        """Fetches robots.txt for multiple URLs"""
+        return asyncio.run(self.fetch_multiple_async(urls))
 
 
 def fetch_robots_txt(url):
     """Helper function to fetch robots.txt for a single URL"""
     fetcher = RobotFetcher()
-    return fetcher.fetch_and_save(url)
+    try:
+        return fetcher.fetch_and_save(url)
+    finally:
+        fetcher.close()
     
 def fetch_multiple_robots_txt(urls):
     """Helper function to fetch robots.txt for multiple URLs"""
     fetcher = RobotFetcher()
-    return fetcher.fetch_multiple(urls)
\ No newline at end of file
+    try:
+        return fetcher.fetch_multiple(urls)
+    finally:
+        fetcher.close()
\ No newline at end of file
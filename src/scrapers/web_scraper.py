@@ -1,53 +1,385 @@
+import aiofiles
+import aiofiles.os
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup, Comment
-from datetime import datetime
-import html2markdown
-import json
-import markdown
+import asyncpg
+from bs4 import BeautifulSoup, Comment, SoupStrainer, Tag
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import html
+import multiprocessing
 import os
 import re
 import uuid
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from urllib.parse import urlsplit
 from playwright.async_api import async_playwright
 
 from src.config import config
-from src.utils import setup_logger
+from src.utils import setup_logger, TokenBucket, dumps_json, loads_json, read_json
+
+# Elements dropped together with their content before conversion
+UNWANTED_TAGS = frozenset([
+    'script', 'style', 'iframe', 'nav', 'footer',
+    'header', 'aside', 'noscript', 'meta', 'link',
+    'button', 'form', 'input', 'svg', 'path'
+])
+
+# Text blocks flattened during cleanup, with their markdown prefix
+BLOCK_PREFIXES = {
+    'p': '',
+    'h1': '# ', 'h2': '## ', 'h3': '### ',
+    'h4': '#### ', 'h5': '##### ', 'h6': '###### '
+}
+
+# Only the article subtree is built while parsing
+ARTICLE_STRAINER = SoupStrainer('article')
+
+# Content elements kept when a page has no article; lxml builds no nodes
+# for anything outside them (scripts, navigation, headers and footers)
+CONTENT_STRAINER = SoupStrainer([
+    'article', 'main', 'p', 'a',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'li', 'ol', 'ul', 'blockquote', 'pre', 'code'
+])
+
+# Common cookie consent buttons, matched in one query so a page without a
+# popup costs a single short timeout
+COOKIE_ACCEPT_SELECTOR = ', '.join([
+    'button[id*="accept"]',
+    'button[class*="accept"]',
+    'button[id*="cookie"]',
+    'button[aria-label*="accept" i]'
+])
+
+# Subresources the scraper never reads, aborted before they are fetched
+BLOCKED_RESOURCE_TYPES = frozenset(['image', 'media', 'font', 'stylesheet'])
+
+# Article markup shorter than this is treated as a placeholder shell
+MIN_ARTICLE_HTML_LENGTH = 500
+
+# Reads the title and just the article subtree in one round-trip, falling
+# back to the whole document when the article is missing or too short
+_PAGE_CONTENT_JS = """() => {
+    const a = document.querySelector('article');
+    const html = a && a.outerHTML.length >= %d ? a.outerHTML : document.documentElement.outerHTML;
+    return {title: document.title, html: html};
+}""" % MIN_ARTICLE_HTML_LENGTH
+
+# Title of a server-rendered page fetched without the browser
+_RE_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+# Patterns used by clean_markdown, compiled once at import. _RE_MARKUP
+# matches bare URLs and markdown links in one alternation; substituting
+# group 1 keeps a link's text and drops the rest. The input is plain text
+# extracted by BeautifulSoup, so a '<' or '>' in it is article content,
+# never a tag.
+_RE_BLANKS = re.compile(r'\n\s*\n')
+_RE_MARKUP = re.compile(r'https?://\S+|\[([^\]]+)\]\([^)]+\)')
+_RE_SPACES = re.compile(r' +')
+_RE_PUNCTLINE = re.compile(r'^\W+$\n', re.MULTILINE)
+_RE_MANYNL = re.compile(r'\n{3,}')
+
+
+async def _block_heavy_resources(route):
+    """Aborts requests for subresources that are not needed for the text"""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def html_to_markdown(html_content):
+    """
+    Extracts the article text of a page as markdown. Module level so it
+    can be pickled into a ProcessPoolExecutor worker.
+    """
+    # First, let's clean the HTML using BeautifulSoup, building only the
+    # article and reparsing for generic content when there is none
+    soup = BeautifulSoup(html_content, 'lxml', parse_only=ARTICLE_STRAINER)
+    if not soup.contents:
+        soup = BeautifulSoup(html_content, 'lxml', parse_only=CONTENT_STRAINER)
+    
+    # Single walk over the tree. Iterating the snapshot in reverse
+    # visits children before their parent, so relative links are
+    # gone before a paragraph is flattened to text.
+    for tag in reversed(list(soup.descendants)):
+        if not isinstance(tag, Tag):
+            continue
+            
+        # Remove unwanted elements more aggressively
+        if tag.name in UNWANTED_TAGS:
+            tag.decompose()
+            continue
+            
+        # Remove class and id attributes
+        tag.attrs.pop('class', None)
+        tag.attrs.pop('id', None)
+        
+        # Remove relative links entirely
+        if tag.name == 'a':
+            href = tag.get('href')
+            if href is not None and not href.startswith(('http://', 'https://')):
+                tag.decompose()
+                
+        # Flatten paragraphs and headings to a single text node,
+        # prefixing headings with their markdown marker
+        elif tag.name in BLOCK_PREFIXES:
+            text = tag.get_text().strip()
+            if text:
+                tag.replace_with(soup.new_string(BLOCK_PREFIXES[tag.name] + text))
+    
+    # Keep only the article body when the page has one
+    root = soup.find('article')
+    if root is None:
+        root = soup
+        
+    # Extract the visible text, one block per paragraph
+    markdown_content = root.get_text(separator='\n\n', strip=True)
+    
+    # Enhanced cleaning
+    return clean_markdown(markdown_content)
+
+
+def clean_markdown(markdown_content):
+    """
+    Enhanced markdown cleaning of the extracted article text
+    """
+    # Remove multiple consecutive blank lines
+    cleaned = _RE_BLANKS.sub('\n\n', markdown_content)
+
+    # Remove URLs, and markdown links but keep their text, in a single pass
+    cleaned = _RE_MARKUP.sub(r'\1', cleaned)
+
+    # Remove extra spaces
+    cleaned = _RE_SPACES.sub(' ', cleaned)
+
+    # Remove lines that are just punctuation or special characters
+    cleaned = _RE_PUNCTLINE.sub('', cleaned)
+
+    # Ensure proper paragraph spacing
+    cleaned = _RE_MANYNL.sub('\n\n', cleaned)
+
+    return cleaned.strip()
 
 
 class WebScraper:
-    def __init__(self):
-        self.logger = setup_logger('web_scraper')
+    # Shared by every instance; configured once at import
+    logger = setup_logger('web_scraper')
+    
+    def __init__(self, rate_limiter=None):
         self.scraper_config = config.SCRAPER_CONFIG
         
-        self.db_conn = psycopg2.connect(
+        # A TokenBucket shared with another client of the same site, such
+        # as the crawler in the pipeline; replaces the per-domain buckets
+        self.rate_limiter = rate_limiter
+        
+        # Created by start(), which has to run inside the event loop; use
+        # the scraper as an async context manager to open and close them
+        self.db_pool = None
+        self._http = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._context_lock = asyncio.Lock()
+        
+        # Pages opened in the current context, and pages still open in every
+        # live one; a context is retired after CONTEXT_RECYCLE_PAGES pages
+        # and closed once its last page is
+        self._context_pages = 0
+        self._open_pages = {}
+        
+        # Domains whose cookie banner has been accepted; the consent cookies
+        # are carried into every recycled context, so the banner is not
+        # looked for again on those domains
+        self._consented_domains = set()
+        
+        self.buckets = {}
+        self._pending_metadata = []
+        self._pool = None
+        
+        # URLs whose metadata batch failed to store; callers mark them
+        # failed so a resumed run scrapes them again
+        self.unsaved_urls = set()
+        
+    async def __aenter__(self):
+        try:
+            await self.start()
+        except Exception:
+            await self.close()
+            raise
+        return self
+        
+    async def __aexit__(self, exc_type, exc, tb):
+        # Store metadata left over from the last partial batch; a failure is
+        # recorded in unsaved_urls and must not mask the results of the batch
+        try:
+            await self.flush_metadata()
+        except Exception as e:
+            self.logger.error(f"Final metadata flush failed: {str(e)}")
+        finally:
+            await self.close()
+            
+    async def start(self):
+        """
+        Opens the PostgreSQL connection pool, the HTTP session, the
+        browser and the worker processes shared by every scrape
+        """
+        # Parsing and cleaning are pure Python; running them in worker
+        # processes keeps the event loop free to drive other fetches.
+        # Workers are spawned, not forked from a process that already runs
+        # resolver threads and holds browser and database sockets.
+        self._pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        
+        # The connector caches DNS and keeps sockets alive between requests
+        # to the same host
+        connector = aiohttp.TCPConnector(
+            limit=32,
+            limit_per_host=8,
+            ttl_dns_cache=600,
+            keepalive_timeout=60
+        )
+        self._http = aiohttp.ClientSession(
+            connector=connector,
+            headers={'User-Agent': self.scraper_config['USER_AGENT']},
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
+        
+        # Connect to the database and boot the browser concurrently, letting
+        # both finish before reporting a failure so close() sees a settled state
+        results = await asyncio.gather(
+            self._create_db_pool(),
+            self._launch_browser(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        
+    async def _create_db_pool(self):
+        """Opens the PostgreSQL connection pool used to store metadata"""
+        self.db_pool = await asyncpg.create_pool(
             host=self.scraper_config['DB_HOST'],
-            port=self.scraper_config['DB_PORT'],
-            dbname=self.scraper_config['DB_NAME'],
+            port=int(self.scraper_config['DB_PORT']),
+            database=self.scraper_config['DB_NAME'],
             user=self.scraper_config['DB_USER'],
-            password=self.scraper_config['DB_PASSWORD']
+            password=self.scraper_config['DB_PASSWORD'],
+            min_size=self.scraper_config.get('DB_POOL_MIN_SIZE', 2),
+            max_size=self.scraper_config.get('DB_POOL_MAX_SIZE', 10)
         )
-        self.last_request_time = {}
         
+    async def _launch_browser(self):
+        """Starts Playwright with one browser and its first context"""
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(
+            headless=self.scraper_config['HEADLESS']
+        )
+        self._context = await self._new_context()
+        
+    async def close(self):
+        """
+        Closes the browser, the HTTP session, the connection pool and the
+        worker processes
+        """
+        for context in list(self._open_pages):
+            await context.close()
+        self._open_pages.clear()
+        self._context = None
+        
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+        if self.db_pool is not None:
+            await self.db_pool.close()
+            self.db_pool = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            
+    async def _new_context(self, storage_state=None):
+        """
+        Creates a browser context that skips heavy subresources, starting
+        from the cookies and local storage in storage_state if given
+        """
+        context = await self._browser.new_context(
+            user_agent=self.scraper_config['USER_AGENT'],
+            storage_state=storage_state
+        )
+        await context.route("**/*", _block_heavy_resources)
+        self._open_pages[context] = 0
+        return context
+        
+    async def _open_page(self):
+        """
+        Opens a page in the current context, first swapping in a fresh
+        context when the current one has served CONTEXT_RECYCLE_PAGES pages.
+        Long-lived contexts with request routing grow in memory. The
+        fresh context inherits the retired one's cookies so accepted
+        consent banners stay accepted.
+        """
+        async with self._context_lock:
+            if self._context_pages >= self.scraper_config.get('CONTEXT_RECYCLE_PAGES', 50):
+                retired = self._context
+                storage_state = await retired.storage_state()
+                self._context = await self._new_context(storage_state)
+                self._context_pages = 0
+                if self._open_pages[retired] == 0:
+                    await self._close_context(retired)
+                    
+            context = self._context
+            self._context_pages += 1
+            self._open_pages[context] += 1
+            
+        try:
+            return context, await context.new_page()
+        except Exception:
+            await self._release_page(context)
+            raise
+            
+    async def _release_page(self, context):
+        """Counts a page of context as closed, closing a retired context"""
+        self._open_pages[context] -= 1
+        if context is not self._context and self._open_pages[context] == 0:
+            await self._close_context(context)
+            
+    async def _close_context(self, context):
+        """Closes a retired browser context"""
+        del self._open_pages[context]
+        await context.close()
+            
     async def _check_rate_limit(self, domain):
-        """Implements rate limiting per domain"""
-        now = datetime.now().timestamp()
-        if domain in self.last_request_time:
-            time_passed = now - self.last_request_time[domain]
-            if time_passed < self.scraper_config['DELAY_BETWEEN_REQUESTS']:
-                await asyncio.sleep(
-                    self.scraper_config['DELAY_BETWEEN_REQUESTS'] - time_passed
-                )
-        self.last_request_time[domain] = now
+        """Implements rate limiting per domain with a token bucket"""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+            return
+            
+        bucket = self.buckets.get(domain)
+        if bucket is None:
+            bucket = self.buckets[domain] = TokenBucket(
+                rate=1 / self.scraper_config['DELAY_BETWEEN_REQUESTS'],
+                capacity=self.scraper_config.get('RATE_LIMIT_BURST', 1)
+            )
+        await bucket.acquire()
 
     async def _handle_page_load(self, page, url):
-        """Handles page loading with retries"""
+        """Handles page loading with retries and exponential backoff"""
         for attempt in range(self.scraper_config['MAX_RETRIES']):
             try:
                 self.logger.info(f"Attempting to load {url} (attempt {attempt + 1})")
+                # Only the markup is read, so there is no need to wait for
+                # images, fonts and trackers to finish loading
                 await page.goto(
                     url, 
+                    wait_until='domcontentloaded',
                     timeout=self.scraper_config['PAGE_LOAD_TIMEOUT']
                 )
                 return True
@@ -56,83 +388,122 @@ class WebScraper:
                     f"Failed to load {url} on attempt {attempt + 1}: {str(e)}"
                 )
                 if attempt < self.scraper_config['MAX_RETRIES'] - 1:
-                    await asyncio.sleep(self.scraper_config['RETRY_DELAY'])
+                    # Back off exponentially so a struggling server gets
+                    # more room on each retry
+                    await asyncio.sleep(self.scraper_config['RETRY_DELAY'] * 2 ** attempt)
                 else:
                     return False
 
     async def _handle_cookies_popup(self, page):
-        """Handles common cookie consent popups"""
+        """
+        Handles common cookie consent popups. Returns True when a consent
+        button was clicked.
+        """
         try:
-            # Add common cookie consent button selectors
-            common_selectors = [
-                'button[id*="accept"]',
-                'button[class*="accept"]',
-                'button[id*="cookie"]',
-                # Add more selectors as needed
-            ]
-            
-            for selector in common_selectors:
-                try:
-                    await page.click(selector, timeout=5000)
-                    self.logger.debug("Handled cookie popup")
-                    break
-                except:
-                    continue
+            # The banner is part of the initial markup when a site has one
+            await page.locator(COOKIE_ACCEPT_SELECTOR).first.click(timeout=500)
+            self.logger.debug("Handled cookie popup")
+            return True
+        except Exception:
+            # No consent button appeared before the timeout
+            self.logger.debug("No cookie popup handled")
+            return False
+
+    async def _fetch_static_html(self, url):
+        """
+        Fetches a page with a plain HTTP GET and returns (title, html) when
+        the server-rendered markup already contains the article, else None
+        """
+        try:
+            async with self._http.get(url) as response:
+                if response.status != 200:
+                    return None
+                html_content = await response.text()
         except Exception as e:
-            self.logger.warning(f"Cookie popup handling failed: {str(e)}")
+            self.logger.warning(f"Plain fetch of {url} failed: {str(e)}")
+            return None
+            
+        if '<article' not in html_content:
+            return None
+            
+        match = _RE_TITLE.search(html_content)
+        title = html.unescape(match.group(1).strip()) if match else ''
+        return title, html_content
+
+    async def _fetch_rendered_html(self, url):
+        """Loads a page in the shared browser and returns (title, html)"""
+        context, page = await self._open_page()
+        
+        try:
+            # Load page
+            if not await self._handle_page_load(page, url):
+                raise Exception("Failed to load page after all retries")
+            
+            # Pages sent to the browser render their article with JavaScript,
+            # which may still be running when DOMContentLoaded fires
+            try:
+                await page.wait_for_selector('article', timeout=3000)
+            except Exception:
+                pass
+                
+            # Handle cookie popups, once per domain
+            domain = urlsplit(url).netloc
+            if domain not in self._consented_domains:
+                if await self._handle_cookies_popup(page):
+                    self._consented_domains.add(domain)
+            
+            # Get page title and only the article markup, falling back to
+            # the full document when the article is missing or too short
+            data = await page.evaluate(_PAGE_CONTENT_JS)
+            return data['title'], data['html']
+            
+        finally:
+            try:
+                await page.close()
+            finally:
+                await self._release_page(context)
 
     async def scrape_url(self, url):
-        """Main scraping function"""
+        """
+        Main scraping function. Tries a plain HTTP fetch first and falls
+        back to a page of the shared browser when the article needs
+        JavaScript to render. Requires start() to have been awaited.
+        """
         document_id = str(uuid.uuid4())
         
         try:
-            async with async_playwright() as playwright:
-                browser = await playwright.chromium.launch(
-                    headless=self.scraper_config['HEADLESS']
-                )
-                context = await browser.new_context(
-                    user_agent=self.scraper_config['USER_AGENT']
-                )
-                page = await context.new_page()
-                
-                # Rate limiting
-                domain = url.split('/')[2]
+            # Rate limiting
+            domain = urlsplit(url).netloc
+            await self._check_rate_limit(domain)
+            
+            self.logger.info(f"Starting scrape of {url}")
+            fetched = await self._fetch_static_html(url)
+            if fetched is None:
+                # The browser navigation is a second request to the site
                 await self._check_rate_limit(domain)
-                
-                # Load page
-                self.logger.info(f"Starting scrape of {url}")
-                if not await self._handle_page_load(page, url):
-                    raise Exception("Failed to load page after all retries")
-                
-                # Handle cookie popups
-                await self._handle_cookies_popup(page)
-                
-                # Get page title
-                title_end = await page.title()
-
-                # Get URL Slug
-                url_slug = url.split('/')[-1]
+                self.logger.debug(f"Rendering {url} in the browser")
+                fetched = await self._fetch_rendered_html(url)
+            title_end, content = fetched
 
-                # Concatenate URL Slug with title_end
-                title = url_slug + ' ' + title_end
+            # Get URL Slug
+            url_slug = url.split('/')[-1]
 
-                # Get HTML content
-                content = await page.content()
-                
-                # Convert to markdown
-                markdown_content = self._html_to_markdown(content)
-                
-                # Store metadata in database
-                await self._store_metadata(document_id, title, url)
-                
-                self.logger.info(f"Successfully scraped {url}")
-                
-                await browser.close()
-                return {
-                    'content': markdown_content,
-                    'document_id': document_id,
-                    'title': title
-                }
+            # Concatenate URL Slug with title_end
+            title = url_slug + ' ' + title_end
+            
+            # Convert to markdown
+            markdown_content = await self._convert_to_markdown(content)
+            
+            # Store metadata in database
+            await self._queue_metadata(document_id, title, url)
+            
+            self.logger.info(f"Successfully scraped {url}")
+            
+            return {
+                'content': markdown_content,
+                'document_id': document_id,
+                'title': title
+            }
                 
         except Exception as e:
             self.logger.error(
@@ -141,141 +512,133 @@ class WebScraper:
             )
             raise
 
-    def _html_to_markdown(self, html_content):
+    async def _convert_to_markdown(self, html_content):
+        """Converts page HTML to markdown in the worker process pool"""
         try:
-            # First, let's clean the HTML using BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove unwanted elements more aggressively
-            unwanted_tags = [
-                'script', 'style', 'iframe', 'nav', 'footer', 
-                'header', 'aside', 'noscript', 'meta', 'link',
-                'button', 'form', 'input', 'svg', 'path'
-            ]
-        
-            # Remove all unwanted tags
-            for tag in unwanted_tags:
-                for element in soup.find_all(tag):
-                    element.decompose()
-            
-            # Remove all class and id attributes
-            for tag in soup.find_all(True):
-                if tag.has_attr('class'):
-                    del tag['class']
-                if tag.has_attr('id'):
-                    del tag['id']
-            
-            # Convert relative links to absolute
-            for a in soup.find_all('a', href=True):
-                if not a['href'].startswith(('http://', 'https://')):
-                    a.decompose()  # Remove relative links entirely
-            
-            # Extract just the text from specific tags
-            for p in soup.find_all('p'):
-                if p.string:
-                    p.replace_with(soup.new_string(p.string))
-            
-            # Convert to markdown
-            markdown_content = html2markdown.convert(str(soup))
-            
-            # Enhanced cleaning
-            markdown_content = self._clean_markdown(markdown_content)
-            
-            return markdown_content
-            
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, html_to_markdown, html_content)
         except Exception as e:
             self.logger.error(
                 f"Error converting HTML to markdown: {str(e)}", 
                 exc_info=True
             )
             raise
-           
-    def _clean_markdown(self, markdown_content):
+
+    async def _queue_metadata(self, document_id, title, url):
         """
-        Enhanced markdown cleaning that extracts content between article tags
+        Buffers document metadata and flushes it once a batch is full.
         """
-        # First extract content between article tags
-        pattern = r'<article[^>]*>([\s\S]*?)</article>'
-        match = re.search(pattern, markdown_content, re.DOTALL)
+        self._pending_metadata.append((document_id, title, url, datetime.now(timezone.utc)))
         
-        if not match:
-            self.logger.debug("No article tags found")
-            # Return original content if no article tags found
-            cleaned = markdown_content
-        else:
-            cleaned = match.group(1)  # Get the content between article tags
-            
-        # Apply the rest of the cleaning operations
-        # Remove multiple consecutive blank lines
-        cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned)
+        if len(self._pending_metadata) >= self.scraper_config.get('METADATA_BATCH_SIZE', 50):
+            await self.flush_metadata()
 
-        # Remove HTML tags that might have survived
-        cleaned = re.sub(r'<[^>]+>', '', cleaned)
-
-        # Remove URLs
-        cleaned = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', cleaned)
-
-        # Remove markdown links but keep text
-        cleaned = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', cleaned)
-
-        # Remove extra spaces
-        cleaned = re.sub(r' +', ' ', cleaned)
-
-        # Remove lines that are just punctuation or special characters
-        cleaned = re.sub(r'^\W+$\n', '', cleaned, flags=re.MULTILINE)
-
-        # Ensure proper paragraph spacing
-        cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
-
-        return cleaned.strip()
-
-    async def _store_metadata(self, document_id, title, url):
+    async def flush_metadata(self):
         """
-        Stores document metadata in PostgreSQL with proper error handling.
+        Stores buffered document metadata in PostgreSQL with a single COPY
+        and proper error handling. When the COPY fails, the URLs of the
+        whole batch are added to unsaved_urls before re-raising.
         """
+        if not self._pending_metadata:
+            return
+            
+        rows = self._pending_metadata
+        self._pending_metadata = []
+        
         try:
-            with self.db_conn.cursor() as cursor:
-                insert_query = """
-                    INSERT INTO scraped_pages (
-                        id, title, url, created_at
-                    ) VALUES (%s, %s, %s, %s)
-                """
-                
-                cursor.execute(
-                    insert_query,
-                    (
-                        document_id,
-                        title, 
-                        url, 
-                        datetime.now()
-                    )
+            async with self.db_pool.acquire() as conn:
+                # COPY streams the whole batch without per-row statement
+                # overhead, and fails as a unit
+                await conn.copy_records_to_table(
+                    'scraped_pages',
+                    records=rows,
+                    columns=('id', 'title', 'url', 'created_at')
                 )
                 
-                self.db_conn.commit()
-                
                 self.logger.info(
-                    f"Successfully stored metadata for document {document_id}"
+                    f"Successfully stored metadata for {len(rows)} documents"
                 )
                 
         except Exception as e:
-            self.db_conn.rollback()
             self.logger.error(
-                f"Error storing metadata for document {document_id}: {str(e)}", 
+                f"Error storing metadata for {len(rows)} documents: {str(e)}", 
                 exc_info=True
             )
+            self.unsaved_urls.update(url for _, _, url, _ in rows)
             raise
 
-    def __del__(self):
-        """
-        Cleanup database connection when object is destroyed
-        """
-        if hasattr(self, 'db_conn'):
-            self.db_conn.close()
 
+class ScrapeCheckpoint:
+    """Append-only JSONL log of per-URL outcomes, used to resume a batch"""
+    
+    def __init__(self, path, flush_every=20):
+        self.path = path
+        self.flush_every = flush_every
+        self._file = None
+        self._unflushed = 0
+        
+    def completed_urls(self):
+        """Returns the URLs already scraped successfully by earlier runs"""
+        completed = set()
+        if not os.path.exists(self.path):
+            return completed
+            
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = loads_json(line)
+                except ValueError:
+                    continue  # Line cut short by an interrupted run
+                # A later record for the same URL supersedes an earlier one
+                if record.get('ok'):
+                    completed.add(record['url'])
+                else:
+                    completed.discard(record['url'])
+        return completed
+        
+    def open(self):
+        """Opens the log for appending, terminating any cut-short last line"""
+        self._file = open(self.path, 'a+b')
+        if self._file.tell() > 0:
+            self._file.seek(-1, os.SEEK_END)
+            if self._file.read(1) != b'\n':
+                self._file.write(b'\n')
+                
+    def record(self, url, ok, document_id=None):
+        """Appends one outcome, syncing to disk every flush_every records"""
+        self._file.write(dumps_json({'url': url, 'ok': ok, 'doc_id': document_id}) + b'\n')
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+            
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed = 0
+        
+    def close(self):
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
 
-async def process_urls_from_json(json_path, output_dir=None):
+
+async def _write_atomic(path, content):
+    """Writes a text file through a temporary file so it is never left half-written"""
+    tmp_path = path + '.tmp'
+    async with aiofiles.open(tmp_path, 'w', encoding='utf-8') as f:
+        await f.write(content)
+    await aiofiles.os.replace(tmp_path, path)
+
+
+async def process_urls(urls, output_dir=None, rate_limiter=None):
     """
-    Processes URLs from a JSON file containing URLs
+    Scrapes a batch of URLs into output_dir
+
+    urls is either an iterable or an asyncio.Queue fed by a producer such as
+    the crawler and closed with None, so scraping can start while URLs are
+    still being discovered. rate_limiter is an optional TokenBucket shared
+    with that producer, so both together keep to one request budget
     """
     # Create output directory with timestamp if not provided
     if output_dir is None:
@@ -286,70 +649,162 @@ async def process_urls_from_json(json_path, output_dir=None):
     
     logger = setup_logger('url_processor')
     
-    try:
-        # Read the JSON file and parse it as a simple array
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            urls = data.get('urls', [])
-        
-        # Create a single scraper instance to reuse database connections
-        scraper = WebScraper()
-        
-        # Keep track of successful and failed URLs
-        successful_urls = []
-        failed_urls = []
-        
-        # Process each URL in the array
-        for url in urls:
-            try:
+    # Skip URLs completed by an earlier, interrupted run into the same
+    # output directory
+    checkpoint = ScrapeCheckpoint(os.path.join(output_dir, 'results.jsonl'))
+    completed_urls = checkpoint.completed_urls()
+    if completed_urls:
+        logger.info(f"Resuming: {len(completed_urls)} URLs already scraped")
+    
+    # Keep track of successful and failed URLs
+    successful_urls = []
+    failed_urls = []
+    
+    # Bound the number of scrapes in flight overall and per domain
+    semaphore = asyncio.Semaphore(config.SCRAPER_CONFIG.get('CONCURRENCY', 5))
+    per_domain_limit = config.SCRAPER_CONFIG.get('PER_DOMAIN_CONCURRENCY', 4)
+    domain_semaphores = defaultdict(lambda: asyncio.Semaphore(per_domain_limit))
+    
+    # Scrapers hand finished pages to a single writer through a bounded
+    # queue, so disk writes and checkpointing never hold up fetching
+    results_queue = asyncio.Queue(maxsize=64)
+    write_errors = {}
+    
+    async def process_url(url):
+        try:
+            async with semaphore, domain_semaphores[urlsplit(url).netloc]:
                 logger.info(f"Starting to process: {url}")
                 
                 # Scrape the URL and get markdown content
                 result = await scraper.scrape_url(url)
                 
-                markdown_content = result['content']
-                document_id = result['document_id']
-                
-                # Save to file in the output directory
-                output_path = os.path.join(output_dir, f'{document_id}.md')
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(markdown_content)
-
-                logger.info(f"Successfully processed {url}")
-                
-                successful_urls.append(url)
+        except Exception:
+            await results_queue.put((url, None))
+            raise
+            
+        await results_queue.put((url, result))
+        
+    def record_outcome(url, ok, document_id=None):
+        # A failed checkpoint write only costs a re-scrape on resume; the
+        # writer has to keep draining the queue or every scrape blocks on it
+        try:
+            checkpoint.record(url, ok, document_id)
+        except Exception as e:
+            logger.error(f"Error checkpointing {url}: {str(e)}")
+            
+    async def write_results():
+        while True:
+            item = await results_queue.get()
+            if item is None:
+                return
                 
-                # Add a polite delay between requests
-                await asyncio.sleep(config.SCRAPER_CONFIG.get('DELAY_BETWEEN_REQUESTS', 3))
+            url, result = item
+            if result is None:
+                record_outcome(url, False)
+                continue
                 
+            try:
+                # Save to file in the output directory
+                output_path = os.path.join(output_dir, f"{result['document_id']}.md")
+                await _write_atomic(output_path, result['content'])
             except Exception as e:
-                logger.error(f"Error processing {url}: {str(e)}")
-                failed_urls.append(url)
+                write_errors[url] = e
+                record_outcome(url, False)
                 continue
                 
-        # Print summary at the end
-        logger.info("\nScraping Summary:")
-        logger.info(f"Successfully processed: {len(successful_urls)} URLs")
-        logger.info(f"Failed to process: {len(failed_urls)} URLs")
-        
-        if failed_urls:
-            logger.info("\nFailed URLs:")
-            for url in failed_urls:
-                logger.info(f"- {url}")
-            
-            # Save failed URLs to a file for later retry
-            failed_urls_path = os.path.join(output_dir, 'failed_urls.json')
-            failed_data = {"urls": failed_urls}
-            with open(failed_urls_path, 'w') as f:
-                json.dump(failed_data, f, indent=2)
-            logger.info("\nFailed URLs have been saved to 'failed_urls.json'")
+            record_outcome(url, True, result['document_id'])
+            logger.info(f"Successfully processed {url}")
             
-        return {
-            "output_dir": output_dir,
-            "successful": len(successful_urls),
-            "failed": len(failed_urls)
-        }
+    async def iter_urls():
+        if isinstance(urls, asyncio.Queue):
+            while (url := await urls.get()) is not None:
+                yield url
+        else:
+            for url in urls:
+                yield url
                 
+    # Use a single scraper instance; it keeps one database pool, HTTP
+    # session and browser for the whole batch, and each URL only opens
+    # its own page when a plain HTTP fetch does not return the article
+    tasks = {}
+    skipped = 0
+    scraper = WebScraper(rate_limiter)
+    checkpoint.open()
+    writer = asyncio.create_task(write_results())
+    try:
+        async with scraper:
+            # Start each URL as soon as it is known; per-domain spacing is
+            # left to the scraper's rate limiter
+            async for url in iter_urls():
+                if url in completed_urls:
+                    skipped += 1
+                elif url not in tasks:
+                    tasks[url] = asyncio.create_task(process_url(url))
+                    
+            outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+            
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        # Let the writer drain what was already scraped; a writer that died
+        # would never take the sentinel, and awaiting it re-raises its error
+        if not writer.done():
+            await results_queue.put(None)
+        await writer
+        
+        # Pages whose metadata never reached the database are redone on resume
+        for url in scraper.unsaved_urls:
+            record_outcome(url, False)
+        checkpoint.close()
+        
+    for url, outcome in zip(tasks, outcomes):
+        outcome = write_errors.get(url, outcome)
+        if isinstance(outcome, Exception):
+            logger.error(f"Error processing {url}: {str(outcome)}")
+            failed_urls.append(url)
+        elif url in scraper.unsaved_urls:
+            logger.error(f"Error processing {url}: metadata was not stored")
+            failed_urls.append(url)
+        else:
+            successful_urls.append(url)
+            
+    # Print summary at the end
+    logger.info("\nScraping Summary:")
+    logger.info(f"Successfully processed: {len(successful_urls)} URLs")
+    logger.info(f"Failed to process: {len(failed_urls)} URLs")
+    
+    if failed_urls:
+        logger.info("\nFailed URLs:")
+        for url in failed_urls:
+            logger.info(f"- {url}")
+        
+        # Save failed URLs to a file for later retry
+        failed_urls_path = os.path.join(output_dir, 'failed_urls.json')
+        failed_data = {"urls": failed_urls}
+        async with aiofiles.open(failed_urls_path, 'wb') as f:
+            await f.write(dumps_json(failed_data, indent=True))
+        logger.info("\nFailed URLs have been saved to 'failed_urls.json'")
+        
+    return {
+        "output_dir": output_dir,
+        "successful": len(successful_urls),
+        "failed": len(failed_urls),
+        "skipped": skipped
+    }
+
+
+async def process_urls_from_json(json_path, output_dir=None):
+    """
+    Processes URLs from a JSON file containing URLs
+    """
+    logger = setup_logger('url_processor')
+    
+    try:
+        # Read the JSON file and parse it as a simple array
+        data = read_json(json_path)
+        urls = data.get('urls', [])
     except Exception as e:
         logger.error(f"Error reading JSON file: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+        
+    return await process_urls(urls, output_dir)
\ No newline at end of file
@@ -1 +1,4 @@
-from .logger import setup_logger
\ No newline at end of file
+from .logger import setup_logger
+from .rate_limiter import TokenBucket
+from .jsonio import dumps_json, loads_json, read_json, write_json
+from .fileio import iter_files, iter_prefetched, read_text, write_text
\ No newline at end of file
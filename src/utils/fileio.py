@@ -0,0 +1,51 @@
+from collections import deque
+import fnmatch
+import os
+
+
+def read_text(path, limit=-1):
+    """Reads a UTF-8 text file, or only its first limit characters"""
+    with open(path, "r", encoding="utf-8", buffering=1 << 16) as f:
+        return f.read(limit)
+
+
+def write_text(path, text):
+    """Writes a UTF-8 text file, creating its parent directory if needed"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def iter_files(directory, pattern="*.md"):
+    """
+    Yields the paths of the regular files in directory whose name matches
+    pattern, in one os.scandir pass. Like glob, hidden files only match a
+    pattern that starts with a dot.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.') and not pattern.startswith('.'):
+                continue
+            if fnmatch.fnmatch(name, pattern) and entry.is_file():
+                yield entry.path
+
+
+def iter_prefetched(pool, func, items, window):
+    """
+    Yields (item, future of func(item)) for each of items in order,
+    submitting the calls to pool at most window items ahead of the
+    consumer so only a bounded number of results is held at once
+    """
+    items = iter(items)
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(func, item)))
+        if len(pending) >= window:
+            break
+            
+    while pending:
+        yield pending.popleft()
+        for item in items:
+            pending.append((item, pool.submit(func, item)))
+            break
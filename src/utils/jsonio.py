@@ -0,0 +1,43 @@
+import json
+import os
+
+# orjson serializes in native code; fall back to the standard library
+# when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps_json(obj, indent=False):
+    """Serializes obj to UTF-8 encoded JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads_json(data):
+    """Parses JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(path):
+    """Reads and parses a JSON file"""
+    with open(path, 'rb') as f:
+        return loads_json(f.read())
+
+
+def write_json(path, obj, indent=True):
+    """
+    Serializes obj to a JSON file, indented by default. The data goes to a
+    temporary file that is then renamed over path, so an interrupted write
+    never leaves a truncated file behind
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps_json(obj, indent=indent))
+    os.replace(tmp_path, path)
@@ -0,0 +1,38 @@
+import asyncio
+
+
+class TokenBucket:
+    """Asyncio token bucket limiting how often callers may proceed"""
+    
+    def __init__(self, rate, capacity=1):
+        """
+        Initialize the bucket full
+        
+        Args:
+            rate (float): Tokens added per second
+            capacity (int): Maximum number of stored tokens, i.e. the allowed burst
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = None
+        self.lock = asyncio.Lock()
+        
+    async def acquire(self):
+        """Waits until a token is available and consumes it"""
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            
+            # Refill for the time elapsed since the last acquisition
+            if self.updated_at is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            
+            if self.tokens < 1:
+                # Holding the lock while sleeping queues the other callers
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 0
+                self.updated_at = loop.time()
+            else:
+                self.tokens -= 1
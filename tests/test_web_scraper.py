@@ -0,0 +1,19 @@
+import unittest
+
+from src.scrapers.web_scraper import html_to_markdown
+
+
+class HtmlToMarkdownTest(unittest.TestCase):
+    def test_keeps_angle_brackets_in_body_text(self):
+        html_content = (
+            '<article><h2>Dosing</h2>'
+            '<p>Keep levels &lt;100 mg/dL and avoid &gt;200 mg/dL.</p></article>'
+        )
+        self.assertEqual(
+            html_to_markdown(html_content),
+            '## Dosing\n\nKeep levels <100 mg/dL and avoid >200 mg/dL.'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()